@@ -10,6 +10,8 @@ from django.utils.timezone import now
 from dateutil.parser import parse
 from dateutil.relativedelta import relativedelta, MO
 from django.conf import settings
+from django.db import connection
+from django.db.models.sql.datastructures import EmptyResultSet
 
 from rest_framework.exceptions import ParseError
 
@@ -199,6 +201,26 @@ def get_time_series_data(queryset, start, end, interval='days', date_field='crea
     return series
 
 
+def count_querysets(*querysets):
+    """
+    Counts the rows of each of the given querysets in a single database round trip
+    """
+    selects = []
+    params = []
+    for index, queryset in enumerate(querysets):
+        try:
+            sql, sql_params = queryset.query.sql_with_params()
+        except EmptyResultSet:
+            selects.append('0')
+            continue
+        selects.append('(SELECT COUNT(*) FROM ({}) AS counted_{})'.format(sql, index))
+        params.extend(sql_params)
+
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT {}'.format(', '.join(selects)), params)
+        return list(cursor.fetchone())
+
+
 def get_ids_from_list_param(request, param_name):
     """
     Returns list of ids extracted from query param
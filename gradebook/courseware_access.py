@@ -1,5 +1,6 @@
 """ Centralized access to LMS courseware app """
 from django.contrib.auth.models import AnonymousUser
+from django.utils.lru_cache import lru_cache
 
 from courseware import courses, module_render
 from courseware.model_data import FieldDataCache
@@ -68,9 +69,11 @@ def get_course_total_score(course_summary):
     return score
 
 
+@lru_cache(maxsize=1024)
 def get_course_key(course_id, slashseparated=False):
     """
-    Returns course_key object generated from course_id
+    Returns course_key object generated from course_id; course keys are immutable, so the
+    parsed keys are memoized
     """
     try:
         course_key = CourseKey.from_string(course_id)
@@ -49,13 +49,15 @@ class Command(BaseCommand):
             users = CourseEnrollment.objects.users_enrolled_in(course_key)
             course = modulestore().get_course(course_key, depth=None)
             if course:
+                # The grading policy is the same for every user of the course, so it is encoded only once
+                grading_policy = course.grading_policy
+                grading_policy_json = json.dumps(grading_policy, cls=EdxJSONEncoder)
                 # For each user...
                 for user in users:
                     request = RequestMockWithoutMiddleware().get('/')
                     request.user = user
                     grade_data = grades.grade(user, request, course)
                     grade = grade_data['percent']
-                    grading_policy = course.grading_policy
                     proforma_grade = grades.calculate_proforma_grade(grade_data, grading_policy)
                     progress_summary = grades.progress_summary(user, request, course, locators_as_strings=True)
                     try:
@@ -65,7 +67,7 @@ class Command(BaseCommand):
                             gradebook_entry.proforma_grade = proforma_grade
                             gradebook_entry.progress_summary = json.dumps(progress_summary, cls=EdxJSONEncoder)
                             gradebook_entry.grade_summary = json.dumps(grade_data, cls=EdxJSONEncoder)
-                            gradebook_entry.grading_policy = json.dumps(grading_policy, cls=EdxJSONEncoder)
+                            gradebook_entry.grading_policy = grading_policy_json
                             gradebook_entry.save()
                     except StudentGradebook.DoesNotExist:
                        pass
@@ -18,6 +18,8 @@ from opaque_keys.edx.keys import CourseKey
 
 log = logging.getLogger(__name__)
 
+REGRADE_BATCH_SIZE = 100
+
 
 class Command(BaseCommand):
     """
@@ -46,30 +48,40 @@ class Command(BaseCommand):
         course = modulestore().get_course(course_key, depth=None)
 
         if course:
-            # For each user...
-            for user in users:
-                course_structure = get_course_blocks(user, course.location)
-                grade_summary = grades.grade(user, course, course_structure)
-                grading_policy = course.grading_policy
-                progress_summary = grades.progress_summary(user, course, course_structure)
-                grade = grade_summary['percent']
-                proforma_grade = grades.calculate_proforma_grade(grade_summary, grading_policy)
-                try:
-                    gradebook_entry = StudentGradebook.objects.get(user=user, course_id=course.id)
-                    gradebook_entry.grade = grade
-                    gradebook_entry.proforma_grade = proforma_grade
-                    gradebook_entry.progress_summary = json.dumps(progress_summary, cls=EdxJSONEncoder)
-                    gradebook_entry.grade_summary = json.dumps(grade_summary, cls=EdxJSONEncoder)
-                    gradebook_entry.grading_policy = json.dumps(grading_policy, cls=EdxJSONEncoder)
-                    gradebook_entry.save()
-                except StudentGradebook.DoesNotExist:
-                    pass
+            # The grading policy is the same for every user of the course, so it is encoded only once
+            grading_policy = course.grading_policy
+            grading_policy_json = json.dumps(grading_policy, cls=EdxJSONEncoder)
+            users = list(users)
+            # Gradebook entries are loaded a batch of users at a time, which keeps the number of queries
+            # low without holding every stored summary of the course in memory
+            for batch_start in range(0, len(users), REGRADE_BATCH_SIZE):
+                user_batch = users[batch_start:batch_start + REGRADE_BATCH_SIZE]
+                gradebook_entries = {
+                    gradebook_entry.user_id: gradebook_entry
+                    for gradebook_entry in StudentGradebook.objects.filter(course_id=course_key, user__in=user_batch)
+                }
+                # For each user...
+                for user in user_batch:
+                    course_structure = get_course_blocks(user, course.location)
+                    grade_summary = grades.grade(user, course, course_structure)
+                    progress_summary = grades.progress_summary(user, course, course_structure)
+                    grade = grade_summary['percent']
+                    proforma_grade = grades.calculate_proforma_grade(grade_summary, grading_policy)
+                    # Users without an entry are not given one
+                    gradebook_entry = gradebook_entries.get(user.id)
+                    if gradebook_entry is not None:
+                        gradebook_entry.grade = grade
+                        gradebook_entry.proforma_grade = proforma_grade
+                        gradebook_entry.progress_summary = json.dumps(progress_summary, cls=EdxJSONEncoder)
+                        gradebook_entry.grade_summary = json.dumps(grade_summary, cls=EdxJSONEncoder)
+                        gradebook_entry.grading_policy = grading_policy_json
+                        gradebook_entry.save()
 
-                users_regraded += 1
-                log.info(
-                    "Gradebook entry updated in Course %s for User id %s with grade: %s, proforma_grade: %s ",
-                    course.id, user.id, grade, proforma_grade
-                )
+                    users_regraded += 1
+                    log.info(
+                        "Gradebook entry updated in Course %s for User id %s with grade: %s, proforma_grade: %s ",
+                        course.id, user.id, grade, proforma_grade
+                    )
         else:
             log.info("Course with course id %s does not exist", course_id)
         log.info("%d users regraded", users_regraded)
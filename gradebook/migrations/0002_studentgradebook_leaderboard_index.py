@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gradebook', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='studentgradebook',
+            name='grade',
+            field=models.FloatField(),
+        ),
+        migrations.AlterIndexTogether(
+            name='studentgradebook',
+            index_together=set([('course_id', 'grade', 'modified')]),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gradebook', '0002_studentgradebook_leaderboard_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='studentgradebookhistory',
+            name='content_hash',
+            field=models.CharField(default='', max_length=40, blank=True),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gradebook', '0003_studentgradebookhistory_content_hash'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='studentgradebookhistory',
+            options={'ordering': ['-modified', '-id'], 'get_latest_by': 'modified'},
+        ),
+    ]
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('gradebook', '0005_studentgradebook_completion_index'),
+    ]
+
+    operations = [
+        migrations.AlterIndexTogether(
+            name='studentgradebook',
+            index_together=set([
+                ('course_id', 'grade', 'modified'),
+                ('course_id', 'proforma_grade', 'grade'),
+                ('course_id', 'modified'),
+            ]),
+        ),
+    ]
@@ -1,11 +1,14 @@
 """
 Django database models supporting the gradebook app
 """
+import hashlib
+
 from django.utils import timezone
 from django.conf import settings
+from django.core.cache import cache
 from django.contrib.auth.models import User
 from django.db import models
-from django.db.models import Avg, Max, Min, Count, F, Q
+from django.db.models import Avg, Count, F, Max, Min, Q
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 from django.utils.translation import ugettext_lazy as _
@@ -16,6 +19,14 @@ from student.models import CourseEnrollment
 from xmodule_django.models import CourseKeyField
 
 
+def get_group_members(group_ids):
+    """
+    Returns a subquery of the ids of users belonging to any of the given groups; filtering on it
+    avoids joining the group memberships and de-duplicating the rows afterwards
+    """
+    return User.groups.through.objects.filter(group_id__in=group_ids).values('user_id')
+
+
 class StudentGradebook(models.Model):
     """
     StudentGradebook is essentially a container used to cache calculated
@@ -23,7 +34,7 @@ class StudentGradebook(models.Model):
     """
     user = models.ForeignKey(User, db_index=True)
     course_id = CourseKeyField(db_index=True, max_length=255, blank=True)
-    grade = models.FloatField(db_index=True)
+    grade = models.FloatField()
     proforma_grade = models.FloatField()
     progress_summary = models.TextField(blank=True)
     grade_summary = models.TextField()
@@ -37,6 +48,14 @@ class StudentGradebook(models.Model):
         Meta information for this Django model
         """
         unique_together = (('user', 'course_id'),)
+        index_together = (
+            # Supports the leaderboard, which ranks the entries of a course by grade and then by modification time
+            ('course_id', 'grade', 'modified'),
+            # Supports completion counts, which compare the proforma grade of the entries of a course to their grade
+            ('course_id', 'proforma_grade', 'grade'),
+            # Supports the time series metrics, which bucket the entries of a course by modification time
+            ('course_id', 'modified'),
+        )
 
     @classmethod
     def generate_leaderboard(cls, course_key, user_id=None, group_ids=None, count=3, exclude_users=None):
@@ -63,8 +82,49 @@ class StudentGradebook(models.Model):
         users (excluding any users who should be excluded), then we modify the course average to account for
         those users who currently lack gradebook entries.  We assume zero grades for these users because they
         have not yet submitted a response to a scored assessment which means no grade has been calculated.
+
+        The course-wide part of the data set is cached for at most GRADEBOOK_LEADERBOARD_CACHE_TIMEOUT
+        seconds. Saving or deleting a gradebook entry or an enrollment of the course invalidates it right
+        away; other changes, such as users being deactivated or changing groups, show up once it expires.
         """
         exclude_users = exclude_users or []
+        cache_key = cls._get_leaderboard_cache_key(course_key, group_ids, exclude_users, count)
+        data = cache.get(cache_key)
+        if data is None:
+            data = cls._compute_leaderboard(course_key, group_ids, exclude_users, count)
+            cache.set(cache_key, data, getattr(settings, 'GRADEBOOK_LEADERBOARD_CACHE_TIMEOUT', 300))
+
+        # If a user_id value was provided, we need to provide some additional user-specific data to the caller
+        if user_id and data['course_count']:
+            # Leaders are ranked the same way as user positions, so a user who is part of
+            # the leaderboard can be positioned without querying the database again
+            user_entry = next(
+                (entry for entry in data['queryset'] if unicode(entry['user__id']) == unicode(user_id)), None
+            )
+            if user_entry is not None:
+                users_above = len([
+                    entry for entry in data['queryset']
+                    if entry['grade'] > user_entry['grade'] or
+                    (entry['grade'] == user_entry['grade'] and entry['modified'] < user_entry['modified'])
+                ])
+                result = {'user_position': users_above + 1, 'user_grade': user_entry['grade']}
+            else:
+                result = cls.get_user_position(
+                    course_key,
+                    user_id,
+                    exclude_users=exclude_users,
+                    group_ids=group_ids,
+                    queryset=cls._get_leaderboard_queryset(course_key, exclude_users, group_ids),
+                )
+            data.update(result)
+
+        return data
+
+    @classmethod
+    def _compute_leaderboard(cls, course_key, group_ids, exclude_users, count):
+        """
+        Computes the course statistics and the Top N users of the leaderboard from the database
+        """
         data = {}
         data['course_avg'] = 0
         data['course_max'] = 0
@@ -75,13 +135,11 @@ class StudentGradebook(models.Model):
         total_user_count = CourseEnrollment.objects.users_enrolled_in(course_key).exclude(id__in=exclude_users).count()
 
         if total_user_count:
-            # Generate the base data set we're going to work with
-            queryset = StudentGradebook.objects.select_related('user')\
-                .filter(course_id__exact=course_key, user__is_active=True, user__courseenrollment__is_active=True,
-                        user__courseenrollment__course_id__exact=course_key).exclude(user__id__in=exclude_users)
-
-            aggregates = queryset.aggregate(Avg('grade'), Max('grade'), Min('grade'), Count('user'))
-            gradebook_user_count = aggregates['user__count']
+            # The statistics are computed over the gradebook entries of the course alone, which the
+            # course indexes serve, only taking into account active users enrolled in the course
+            queryset = cls._get_leaderboard_queryset(course_key, exclude_users, None)
+            aggregates = queryset.aggregate(Avg('grade'), Max('grade'), Min('grade'), Count('id'))
+            gradebook_user_count = aggregates['id__count']
 
             if gradebook_user_count:
                 # Calculate the class average
@@ -91,37 +149,79 @@ class StudentGradebook(models.Model):
                     course_avg = course_avg / total_user_count * gradebook_user_count
 
                     # Fill up the response container
-                    data['course_avg'] = float("{0:.3f}".format(course_avg))
+                    data['course_avg'] = round(course_avg, 3)
                     data['course_max'] = aggregates['grade__max']
                     data['course_min'] = aggregates['grade__min']
                     data['course_count'] = gradebook_user_count
 
-                if group_ids:
-                    queryset = queryset.filter(user__groups__in=group_ids).distinct()
-
-                # Construct the leaderboard as a queryset
-                data['queryset'] = queryset.values(
+                # Construct the leaderboard
+                queryset = cls._get_leaderboard_queryset(course_key, exclude_users, group_ids)
+                data['queryset'] = list(queryset.values(
                     'user__id',
                     'user__username',
                     'grade',
-                    'modified')\
-                    .order_by('-grade', 'modified')[:count]
-                # If a user_id value was provided, we need to provide some additional user-specific data to the caller
-                if user_id:
-                    result = cls.get_user_position(
-                        course_key,
-                        user_id,
-                        exclude_users=exclude_users,
-                        group_ids=group_ids,
-                    )
-                    data.update(result)
+                    'modified')
+                    .order_by('-grade', 'modified')[:count])
 
         return data
 
     @classmethod
-    def get_user_position(cls, course_key, user_id, exclude_users=None, group_ids=None):
+    def _get_leaderboard_queryset(cls, course_key, exclude_users, group_ids):
+        """
+        Returns the gradebook entries ranked by the leaderboard of the given course
+        """
+        # Restrict to enrolled users with a subquery rather than a join, which would fan out rows
+        enrolled_users = CourseEnrollment.objects.filter(course_id__exact=course_key, is_active=True).values('user_id')
+        queryset = cls.objects.filter(
+            course_id__exact=course_key,
+            user__is_active=True,
+            user__in=enrolled_users
+        ).exclude(
+            user__in=exclude_users
+        )
+
+        if group_ids:
+            queryset = queryset.filter(user__in=get_group_members(group_ids))
+
+        return queryset
+
+    @classmethod
+    def _get_leaderboard_cache_key(cls, course_key, group_ids, exclude_users, count):
         """
-        Helper method to return the user's position in the leaderboard for Proficiency
+        Returns the cache key of a leaderboard, which embeds the current leaderboard version of the course
+        """
+        version = cache.get(cls._get_leaderboard_version_cache_key(course_key), 0)
+        key = repr((unicode(course_key), version, sorted(group_ids or []), sorted(exclude_users), unicode(count)))
+        return u'gradebook.leaderboard.{}'.format(hashlib.md5(key).hexdigest())
+
+    @classmethod
+    def _get_leaderboard_version_cache_key(cls, course_key):
+        """
+        Returns the cache key holding the current leaderboard version of a course
+        """
+        return u'gradebook.leaderboard.version.{}'.format(hashlib.md5(unicode(course_key).encode('utf-8')).hexdigest())
+
+    @classmethod
+    def invalidate_leaderboard_cache(cls, course_key):
+        """
+        Invalidates all the cached leaderboards of a course by moving it to a new leaderboard version
+        """
+        version_cache_key = cls._get_leaderboard_version_cache_key(course_key)
+        # Adding the first version atomically keeps concurrent invalidations from overwriting each other
+        if not cache.add(version_cache_key, 1, None):
+            try:
+                cache.incr(version_cache_key)
+            except ValueError:
+                # The version was evicted since it was added
+                cache.set(version_cache_key, 1, None)
+
+    @classmethod
+    def get_user_position(cls, course_key, user_id, exclude_users=None, group_ids=None, queryset=None):
+        """
+        Helper method to return the user's position in the leaderboard for Proficiency.
+        Users are ranked by grade, ties going to the user whose grade was recorded first.
+        Callers which already built the leaderboard entries queryset can pass it along
+        to avoid rebuilding it from the exclude_users and group_ids filters.
         """
         exclude_users = exclude_users or []
         data = {'user_position': 0, 'user_grade': 0}
@@ -129,26 +229,19 @@ class StudentGradebook(models.Model):
         users_above = 0
         user_time_scored = timezone.now()
         try:
-            user_queryset = StudentGradebook.objects.get(course_id__exact=course_key, user__id=user_id)
+            user_queryset = StudentGradebook.objects.only('grade', 'modified').get(
+                course_id__exact=course_key,
+                user__id=user_id
+            )
         except StudentGradebook.DoesNotExist:
             user_queryset = None
 
         if user_queryset:
             user_grade = user_queryset.grade
-            user_time_scored = user_queryset.created
-
-        queryset = StudentGradebook.objects.select_related('user').filter(
-            course_id__exact=course_key,
-            user__is_active=True,
-            user__courseenrollment__is_active=True,
-            user__courseenrollment__course_id__exact=course_key
-        ).exclude(
-            user__in=exclude_users
-        )
-
-        if group_ids:
-            queryset = queryset.filter(user__groups__in=group_ids).distinct()
+            user_time_scored = user_queryset.modified
 
+        if queryset is None:
+            queryset = cls._get_leaderboard_queryset(course_key, exclude_users, group_ids)
         users_above = queryset.filter(
             Q(grade__gt=user_grade) |
             Q(grade=user_grade, modified__lt=user_time_scored)
@@ -173,12 +266,14 @@ class StudentGradebook(models.Model):
             proforma_grade__lte=F('grade') + grade_complete_match_range,
             proforma_grade__gt=0
         ).exclude(user__id__in=exclude_users)
+        # A user has a single enrollment per course, so only the organization and group filters
+        # could duplicate rows; filtering on subqueries keeps the count free of DISTINCT
         if org_ids:
-            queryset = queryset.filter(user__organizations__in=org_ids)
+            queryset = queryset.filter(user__in=User.objects.filter(organizations__in=org_ids).values('id'))
         if group_ids:
-            queryset = queryset.filter(user__groups__in=group_ids)
+            queryset = queryset.filter(user__in=get_group_members(group_ids))
 
-        return queryset.distinct().count()
+        return queryset.count()
 
 
 class StudentGradebookHistory(TimeStampedModel):
@@ -193,38 +288,56 @@ class StudentGradebookHistory(TimeStampedModel):
     progress_summary = models.TextField(blank=True)
     grade_summary = models.TextField()
     grading_policy = models.TextField()
+    # Digest of the grade data above, so that changes are detected without reading back the text columns
+    content_hash = models.CharField(max_length=40, blank=True)
+
+    class Meta(object):
+        """
+        Meta information for this Django model
+        """
+        ordering = ['-modified', '-id']
+        get_latest_by = 'modified'
+
+    @staticmethod
+    def get_content_hash(entry):
+        """
+        Returns a digest of the grade data held by a gradebook (or gradebook history) entry
+        """
+        content_hash = hashlib.sha1()
+        for value in (
+            repr(float(entry.grade)),
+            repr(float(entry.proforma_grade)),
+            entry.progress_summary,
+            entry.grade_summary,
+            entry.grading_policy
+        ):
+            if isinstance(value, unicode):
+                value = value.encode('utf-8')
+            content_hash.update(str(value))
+            content_hash.update('\0')
+        return content_hash.hexdigest()
 
     @receiver(post_save, sender=StudentGradebook)
     def save_history(sender, instance, **kwargs):  # pylint: disable=no-self-argument, unused-argument
         """
         Event hook for creating gradebook entry copies
         """
-        history_entries = StudentGradebookHistory.objects.filter(user=instance.user, course_id=instance.course_id)
-        latest_history_entry = None
-        if len(history_entries):
-            latest_history_entry = history_entries[0]
-
-        create_history_entry = False
-        if latest_history_entry is not None:
-            if (
-                latest_history_entry.grade != instance.grade or
-                latest_history_entry.proforma_grade != instance.proforma_grade or
-                latest_history_entry.progress_summary != instance.progress_summary or
-                latest_history_entry.grade_summary != instance.grade_summary or
-                latest_history_entry.grading_policy != instance.grading_policy
-            ):
-                create_history_entry = True
-        else:
-            create_history_entry = True
-
-        if create_history_entry:
+        latest_content_hash = StudentGradebookHistory.objects.filter(
+            user_id=instance.user_id,
+            course_id=instance.course_id
+        ).values_list('content_hash', flat=True).first()
+
+        # Entries recorded before hashes were introduced have an empty hash and are superseded
+        content_hash = StudentGradebookHistory.get_content_hash(instance)
+        if latest_content_hash != content_hash:
             new_history_entry = StudentGradebookHistory(
-                user=instance.user,
+                user_id=instance.user_id,
                 course_id=instance.course_id,
                 grade=instance.grade,
                 proforma_grade=instance.proforma_grade,
                 progress_summary=instance.progress_summary,
                 grade_summary=instance.grade_summary,
-                grading_policy=instance.grading_policy
+                grading_policy=instance.grading_policy,
+                content_hash=content_hash
             )
             new_history_entry.save()
@@ -1,6 +1,57 @@
+from django.utils.translation import ugettext_lazy as _
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class GradebookPagination(PageNumberPagination):
+    """
+    Page number pagination which never counts the paginated items: it fetches one item
+    past the requested page to find out whether there is a next page. Responses therefore
+    carry no count, and pages can only be requested by number (page=last is not supported).
+    """
     page_size = 20
     page_size_query_param = 'page_size'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        try:
+            self.page_number = int(request.query_params.get(self.page_query_param, 1))
+        except ValueError:
+            self.page_number = 0
+        if self.page_number < 1:
+            raise NotFound(_('Invalid page.'))
+
+        offset = (self.page_number - 1) * page_size
+        items = list(queryset[offset:offset + page_size + 1])
+        # Like the default pagination, only the first page may be empty
+        if not items and self.page_number > 1:
+            raise NotFound(_('Invalid page.'))
+        self.has_next = len(items) > page_size
+        self.request = request
+        return items[:page_size]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.page_query_param, self.page_number + 1)
+
+    def get_previous_link(self):
+        if self.page_number <= 1:
+            return None
+        url = self.request.build_absolute_uri()
+        if self.page_number == 2:
+            return remove_query_param(url, self.page_query_param)
+        return replace_query_param(url, self.page_query_param, self.page_number - 1)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data
+        })
@@ -1,4 +1,6 @@
 """ Django REST Framework Serializers """
+from django.conf import settings
+
 from openedx.core.lib.courses import course_image_url
 
 from rest_framework import serializers
@@ -7,74 +9,85 @@ from rest_framework.reverse import reverse
 from openedx.core.djangoapps.content.course_overviews.models import CourseOverview
 
 
+class DataValueField(serializers.ReadOnlyField):
+    """
+    Read-only field returning the value stored under its name in the serialized data, or a default value
+    when the data lacks it
+    """
+    def __init__(self, default_value=None, **kwargs):
+        self.default_value = default_value
+        super(DataValueField, self).__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        return instance.get(self.field_name, self.default_value)
+
+
+class BlockIdField(serializers.ReadOnlyField):
+    """
+    Read-only field returning the module id of the serialized data, falling back to its block id
+    """
+    def get_attribute(self, instance):
+        return str(instance.get('module_id', instance.get('block_id', '')))
+
+
+class AttributeValueField(serializers.ReadOnlyField):
+    """
+    Read-only field returning the attribute of its name of the serialized object, or a default value
+    when the object lacks it
+    """
+    def __init__(self, default_value=None, **kwargs):
+        self.default_value = default_value
+        super(AttributeValueField, self).__init__(**kwargs)
+
+    def get_attribute(self, instance):
+        return getattr(instance, self.field_name, self.default_value)
+
+
 class ScoreSerializer(serializers.Serializer):
-    auto_grade = serializers.SerializerMethodField()
+    auto_grade = AttributeValueField()
     earned = serializers.FloatField()
     graded = serializers.BooleanField()
     module_id = serializers.SerializerMethodField()
     possible = serializers.FloatField()
     section = serializers.CharField()
 
-    def get_auto_grade(self, data):
-        return getattr(data, 'auto_grade', None)
-
     def get_module_id(self, data):
-        return str(data.module_id)
+        # Grade summary serializers share a map of the module keys they already stringified
+        module_ids = self.context.get('module_ids')
+        if module_ids is None:
+            return str(data.module_id)
+        module_id = module_ids.get(data.module_id)
+        if module_id is None:
+            module_id = module_ids[data.module_id] = str(data.module_id)
+        return module_id
 
 
 class SectionBreakdownSerializer(serializers.Serializer):
     are_grades_published = serializers.SerializerMethodField()
-    auto_grade = serializers.SerializerMethodField()
+    auto_grade = DataValueField()
     category = serializers.CharField()
-    chapter_name = serializers.SerializerMethodField()
-    comment = serializers.SerializerMethodField()
+    chapter_name = DataValueField(default_value='')
+    comment = DataValueField(default_value='')
     detail = serializers.CharField()
     displayed_value = serializers.CharField()
     grade_description = serializers.CharField()
-    is_ag = serializers.SerializerMethodField()
-    is_average = serializers.SerializerMethodField()
-    is_manually_graded = serializers.SerializerMethodField()
+    is_ag = DataValueField(default_value=False)
+    is_average = DataValueField(default_value=False)
+    is_manually_graded = DataValueField(default_value=False)
     label = serializers.CharField()
     letter_grade = serializers.CharField()
-    module_id = serializers.SerializerMethodField()
+    module_id = BlockIdField()
     percent = serializers.CharField()
     score_earned = serializers.CharField()
     score_possible = serializers.CharField()
-    section_block_id = serializers.SerializerMethodField()
-    subsection_name = serializers.SerializerMethodField()
+    section_block_id = DataValueField(default_value='')
+    subsection_name = DataValueField(default_value='')
 
     def get_are_grades_published(self, data):
-        if self.get_is_manually_graded(data):
+        if data.get('is_manually_graded', False):
             return data.get('are_grades_published', False)
         return True
 
-    def get_auto_grade(self, data):
-        return data.get('auto_grade')
-
-    def get_chapter_name(self, data):
-        return data.get('chapter_name', '')
-
-    def get_comment(self, data):
-        return data.get('comment', '')
-
-    def get_is_ag(self, data):
-        return data.get('is_ag', False)
-
-    def get_is_average(self, data):
-        return data.get('is_average', False)
-
-    def get_is_manually_graded(self, data):
-        return data.get('is_manually_graded', False)
-
-    def get_module_id(self, data):
-        return str(data.get('module_id', data.get('block_id', '')))
-
-    def get_section_block_id(self, data):
-        return data.get('section_block_id', '')
-
-    def get_subsection_name(self, data):
-        return data.get('subsection_name', '')
-
 
 class GradeSummarySerializer(serializers.Serializer):
     """ Serializer for student grade summary """
@@ -90,11 +103,18 @@ class GradeSummarySerializer(serializers.Serializer):
     total_letter_grade = serializers.CharField()
     totaled_scores = serializers.SerializerMethodField()
 
+    def to_representation(self, instance):
+        # Raw and totaled scores refer to the same modules, whose keys are stringified once per summary
+        self.context['module_ids'] = {}
+        return super(GradeSummarySerializer, self).to_representation(instance)
+
     def get_totaled_scores(self, data):
-        for section in data['totaled_scores']:
-            yield {
-                section: ScoreSerializer(data['totaled_scores'][section], many=True).data
-            }
+        # A single list serializer renders the scores of every section
+        scores_serializer = ScoreSerializer(many=True, context=self.context)
+        return _group_totaled_scores(
+            (section, scores_serializer.to_representation(scores))
+            for section, scores in data['totaled_scores'].iteritems()
+        )
 
 
 class StudentGradebookEntrySerializer(serializers.Serializer):
@@ -108,6 +128,17 @@ class StudentGradebookEntrySerializer(serializers.Serializer):
     username = serializers.CharField()
 
 
+def _group_totaled_scores(section_scores):
+    """
+    Groups rendered (section, scores) pairs the way the totaled scores of a grade summary are exposed:
+    a list of single-section dicts, or a single dict keyed by section when the
+    GRADEBOOK_TOTALED_SCORES_AS_DICT feature is enabled
+    """
+    if settings.FEATURES.get('GRADEBOOK_TOTALED_SCORES_AS_DICT', False):
+        return dict(section_scores)
+    return [{section: scores} for section, scores in section_scores]
+
+
 class GradeSerializer(serializers.Serializer):
     """ Serializer for model interactions """
     grade = serializers.FloatField()
@@ -122,6 +153,23 @@ class CourseLeadersSerializer(serializers.Serializer):
     recorded = serializers.DateTimeField(source='modified')
 
 
+def serialize_course_leaders(leaders):
+    """
+    Renders leaderboard rows the way CourseLeadersSerializer does, without instantiating
+    serializer fields for every row
+    """
+    recorded_field = serializers.DateTimeField()
+    return [
+        {
+            'id': leader['user__id'],
+            'username': leader['user__username'],
+            'grade': leader['grade'],
+            'recorded': recorded_field.to_representation(leader['modified']),
+        }
+        for leader in leaders
+    ]
+
+
 class CourseSocialLeadersSerializer(serializers.Serializer):
     """ Serializer for course leaderboard """
     id = serializers.IntegerField(source='user__id')  # pylint: disable=invalid-name
@@ -3,9 +3,11 @@ Signal handlers supporting various gradebook use cases
 """
 import logging
 
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 
 from courseware.signals import score_changed
+from student.models import CourseEnrollment
 from util.signals import course_deleted
 
 from gradebook.models import StudentGradebook, StudentGradebookHistory
@@ -34,3 +36,23 @@ def on_course_deleted(sender, **kwargs):  # pylint: disable=W0613
     course_key = kwargs['course_key']
     StudentGradebook.objects.filter(course_id=course_key).delete()
     StudentGradebookHistory.objects.filter(course_id=course_key).delete()
+    StudentGradebook.invalidate_leaderboard_cache(course_key)
+
+
+@receiver(post_save, sender=StudentGradebook)
+@receiver(post_delete, sender=StudentGradebook)
+def on_gradebook_changed(sender, instance, **kwargs):  # pylint: disable=W0613
+    """
+    Listens for gradebook entry saves and deletions and invalidates the cached leaderboards of the course
+    """
+    StudentGradebook.invalidate_leaderboard_cache(instance.course_id)
+
+
+@receiver(post_save, sender=CourseEnrollment)
+@receiver(post_delete, sender=CourseEnrollment)
+def on_enrollment_changed(sender, instance, **kwargs):  # pylint: disable=W0613
+    """
+    Listens for enrollment changes, which change the users ranked and averaged by the leaderboards
+    of the course, and invalidates its cached leaderboards
+    """
+    StudentGradebook.invalidate_leaderboard_cache(instance.course_id)
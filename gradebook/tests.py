@@ -5,17 +5,29 @@ Run these tests @ Devstack:
 """
 from mock import patch
 import json
-from datetime import datetime
+from collections import namedtuple
+from datetime import datetime, timedelta
 
-from django.utils.timezone import UTC
+from django.utils.timezone import UTC, now
 from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.core.urlresolvers import reverse
+from django.test import TestCase
 from django.test.utils import override_settings
 
+from opaque_keys.edx.keys import CourseKey
 from xmodule.modulestore.tests.django_utils import ModuleStoreTestCase, mixed_store_config
-from student.tests.factories import UserFactory, AdminFactory
+from xmodule.modulestore.tests.factories import CourseFactory
+from student.models import CourseEnrollment
+from student.roles import CourseInstructorRole, CourseStaffRole, OrgStaffRole
+from student.tests.factories import CourseEnrollmentFactory, UserFactory, AdminFactory
 from courseware.tests.factories import StaffFactory
 
+from gradebook.api_utils import count_querysets
 from gradebook.models import StudentGradebook, StudentGradebookHistory
+from gradebook.serializers import StudentGradebookEntrySerializer
+from gradebook.utils import get_cached_aggregate_exclusion_user_ids, get_enrolled_non_staff_students
 from util.signals import course_deleted
 
 from gradebook.test_utils import (
@@ -257,3 +269,575 @@ class GradebookTests(SignalDisconnectTestMixin, CourseGradingMixin, ModuleStoreT
 
         history = StudentGradebookHistory.objects.all()
         self.assertEqual(len(history), 0)
+
+
+class StudentGradebookHistoryTests(TestCase):
+    """ Test suite for the history of gradebook entries """
+
+    def setUp(self):
+        super(StudentGradebookHistoryTests, self).setUp()
+        self.course_key = CourseKey.from_string('course-v1:gradeX+GRAD1+2016')
+        self.gradebook = StudentGradebook.objects.create(
+            user=UserFactory(),
+            course_id=self.course_key,
+            grade=0.25,
+            proforma_grade=0.5,
+            progress_summary='{"chapters": []}',
+            grade_summary='{"percent": 0.25}',
+            grading_policy='{"GRADER": []}'
+        )
+
+    def _get_history(self):
+        """
+        Returns the history entries of the test gradebook entry, latest first
+        """
+        return StudentGradebookHistory.objects.filter(user=self.gradebook.user, course_id=self.course_key)
+
+    def test_identical_content_records_no_history(self):
+        self.assertEqual(self._get_history().count(), 1)
+
+        self.gradebook.save()
+        self.assertEqual(self._get_history().count(), 1)
+
+        # Values read back from the database are the same content as the ones first saved
+        gradebook = StudentGradebook.objects.get(pk=self.gradebook.pk)
+        gradebook.save()
+        self.assertEqual(self._get_history().count(), 1)
+
+    def test_changed_content_records_history(self):
+        self.gradebook.grade = 0.75
+        self.gradebook.save()
+        self.assertEqual(self._get_history().count(), 2)
+        self.assertEqual(self._get_history().first().grade, 0.75)
+
+        self.gradebook.grade_summary = '{"percent": 0.75}'
+        self.gradebook.save()
+        self.assertEqual(self._get_history().count(), 3)
+        self.assertEqual(self._get_history().first().grade_summary, '{"percent": 0.75}')
+
+        # Content is compared to the latest history entry only, so reverting a change is recorded too
+        self.gradebook.grade = 0.25
+        self.gradebook.grade_summary = '{"percent": 0.25}'
+        self.gradebook.save()
+        self.assertEqual(self._get_history().count(), 4)
+
+
+@override_settings(MODULESTORE=MODULESTORE_CONFIG)
+class LeaderboardTests(CourseGradingMixin, ModuleStoreTestCase):
+    """ Test suite for course leaderboards """
+
+    def setUp(self):
+        super(LeaderboardTests, self).setUp()
+        cache.clear()
+        self.course = self.setup_course_with_grading()
+
+    def _create_gradebook(self, username, grade):
+        """
+        Creates the gradebook entry of a new user enrolled in the test course
+        """
+        user = UserFactory(username=username)
+        CourseEnrollmentFactory(user=user, course_id=self.course.id)
+        return StudentGradebook.objects.create(
+            user=user,
+            course_id=self.course.id,
+            grade=grade,
+            proforma_grade=grade,
+            grade_summary='{}',
+            grading_policy='{}'
+        )
+
+    def _get_leaders(self, leaderboard):
+        """
+        Returns the usernames of the leaders of a leaderboard
+        """
+        return [leader['user__username'] for leader in leaderboard['queryset']]
+
+    def test_leaderboard_changes_on_gradebook_save(self):
+        self._create_gradebook('alice', 0.8)
+        bob_gradebook = self._create_gradebook('bob', 0.5)
+        leaderboard = StudentGradebook.generate_leaderboard(self.course.id, count=2)
+        self.assertEqual(self._get_leaders(leaderboard), ['alice', 'bob'])
+        self.assertEqual(leaderboard['course_avg'], 0.65)
+
+        bob_gradebook.grade = 0.9
+        bob_gradebook.save()
+
+        leaderboard = StudentGradebook.generate_leaderboard(self.course.id, count=2)
+        self.assertEqual(self._get_leaders(leaderboard), ['bob', 'alice'])
+        self.assertEqual(leaderboard['course_avg'], 0.85)
+        self.assertEqual(leaderboard['course_max'], 0.9)
+
+    def test_leaderboard_changes_on_gradebook_delete(self):
+        alice_gradebook = self._create_gradebook('alice', 0.8)
+        self._create_gradebook('bob', 0.5)
+        leaderboard = StudentGradebook.generate_leaderboard(self.course.id, count=2)
+        self.assertEqual(leaderboard['course_count'], 2)
+
+        alice_gradebook.delete()
+
+        leaderboard = StudentGradebook.generate_leaderboard(self.course.id, count=2)
+        self.assertEqual(self._get_leaders(leaderboard), ['bob'])
+        self.assertEqual(leaderboard['course_count'], 1)
+        # Alice is still enrolled, without a grade
+        self.assertEqual(leaderboard['course_avg'], 0.25)
+
+    def test_leaderboard_changes_on_unenrollment(self):
+        alice_gradebook = self._create_gradebook('alice', 0.8)
+        self._create_gradebook('bob', 0.5)
+        leaderboard = StudentGradebook.generate_leaderboard(self.course.id, count=2)
+        self.assertEqual(self._get_leaders(leaderboard), ['alice', 'bob'])
+
+        CourseEnrollment.unenroll(alice_gradebook.user, self.course.id)
+
+        leaderboard = StudentGradebook.generate_leaderboard(self.course.id, count=2)
+        self.assertEqual(self._get_leaders(leaderboard), ['bob'])
+        self.assertEqual(leaderboard['course_avg'], 0.5)
+
+    def test_user_position_changes_on_gradebook_save(self):
+        self._create_gradebook('alice', 0.8)
+        bob_gradebook = self._create_gradebook('bob', 0.5)
+        leaderboard = StudentGradebook.generate_leaderboard(self.course.id, user_id=bob_gradebook.user_id, count=1)
+        self.assertEqual(leaderboard['user_position'], 2)
+
+        bob_gradebook.grade = 0.9
+        bob_gradebook.save()
+
+        leaderboard = StudentGradebook.generate_leaderboard(self.course.id, user_id=bob_gradebook.user_id, count=1)
+        self.assertEqual(leaderboard['user_position'], 1)
+        self.assertEqual(leaderboard['user_grade'], 0.9)
+
+    def test_ties_go_to_earliest_modified_grade(self):
+        alice_gradebook = self._create_gradebook('alice', 0.8)
+        bob_gradebook = self._create_gradebook('bob', 0.8)
+        current_time = now()
+        # Alice's entry was created first, but her grade was modified last
+        StudentGradebook.objects.filter(pk=alice_gradebook.pk).update(
+            created=current_time - timedelta(hours=2), modified=current_time
+        )
+        StudentGradebook.objects.filter(pk=bob_gradebook.pk).update(
+            created=current_time - timedelta(hours=1), modified=current_time - timedelta(hours=1)
+        )
+
+        leaderboard = StudentGradebook.generate_leaderboard(self.course.id, user_id=alice_gradebook.user_id, count=2)
+        self.assertEqual(self._get_leaders(leaderboard), ['bob', 'alice'])
+        self.assertEqual(leaderboard['user_position'], 2)
+
+        # Users positioned outside of the fetched leaders are ranked the same way
+        leaderboard = StudentGradebook.generate_leaderboard(self.course.id, user_id=alice_gradebook.user_id, count=1)
+        self.assertEqual(self._get_leaders(leaderboard), ['bob'])
+        self.assertEqual(leaderboard['user_position'], 2)
+        self.assertEqual(StudentGradebook.get_user_position(self.course.id, bob_gradebook.user_id)['user_position'], 1)
+
+
+@override_settings(MODULESTORE=MODULESTORE_CONFIG)
+class EnrolledNonStaffStudentsTests(CourseGradingMixin, ModuleStoreTestCase):
+    """ Test suite for the students listed in course gradebooks """
+
+    def setUp(self):
+        super(EnrolledNonStaffStudentsTests, self).setUp()
+        self.course = self.setup_course_with_grading()
+
+    def _enroll(self, username, **kwargs):
+        """
+        Creates a user enrolled in the test course
+        """
+        user = UserFactory(username=username, **kwargs)
+        CourseEnrollmentFactory(user=user, course_id=self.course.id)
+        return user
+
+    def test_staff_users_are_excluded(self):
+        self._enroll('zoe')
+        self._enroll('adam')
+        CourseStaffRole(self.course.id).add_users(self._enroll('course_staff'))
+        CourseInstructorRole(self.course.id).add_users(self._enroll('course_instructor'))
+        OrgStaffRole(self.course.id.org).add_users(self._enroll('org_staff'))
+        self._enroll('global_staff', is_staff=True)
+        # Staff of another course remain students of this one
+        other_course = CourseFactory.create(org='otherX', run='OTHER1')
+        CourseStaffRole(other_course.id).add_users(self._enroll('other_course_staff'))
+        # Users who are not enrolled are never listed
+        UserFactory(username='not_enrolled')
+
+        students = get_enrolled_non_staff_students(self.course.id)
+        self.assertEqual(
+            [student.username for student in students],
+            ['adam', 'other_course_staff', 'zoe']
+        )
+
+
+class CachedAggregateExclusionUserIdsTests(TestCase):
+    """ Test suite for the caching of the users left out of course aggregations """
+
+    def setUp(self):
+        super(CachedAggregateExclusionUserIdsTests, self).setUp()
+        cache.clear()
+        self.course_key = CourseKey.from_string('course-v1:gradeX+GRAD1+2016')
+
+    @patch('gradebook.utils.get_aggregate_exclusion_user_ids', return_value=[3, 5])
+    def test_exclusion_user_ids_cached_by_roles(self, get_exclusion_user_ids):
+        for __ in range(2):
+            self.assertEqual(get_cached_aggregate_exclusion_user_ids(self.course_key), frozenset([3, 5]))
+        self.assertEqual(get_exclusion_user_ids.call_count, 1)
+        get_exclusion_user_ids.assert_called_with(self.course_key, roles=None)
+
+        # Another set of roles is cached separately, whatever the order its roles are given in
+        get_cached_aggregate_exclusion_user_ids(self.course_key, roles=['observer', 'assistant'])
+        get_cached_aggregate_exclusion_user_ids(self.course_key, roles=['assistant', 'observer'])
+        self.assertEqual(get_exclusion_user_ids.call_count, 2)
+        get_exclusion_user_ids.assert_called_with(self.course_key, roles=['observer', 'assistant'])
+
+
+@override_settings(MODULESTORE=MODULESTORE_CONFIG)
+class CourseGradeBookPaginationTests(CourseGradingMixin, ModuleStoreTestCase):
+    """ Test suite for the pagination of course gradebooks """
+
+    def setUp(self):
+        super(CourseGradeBookPaginationTests, self).setUp()
+        self.course = self.setup_course_with_grading()
+        self.uri = reverse('course-gradebook', kwargs={'course_id': unicode(self.course.id)})
+        for index in range(5):
+            CourseEnrollmentFactory(user=UserFactory(username='student{}'.format(index)), course_id=self.course.id)
+        staff = AdminFactory()
+        self.client.login(username=staff.username, password='test')
+
+        patcher = patch('gradebook.views.prepare_gradebook', side_effect=self._prepare_gradebook)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _prepare_gradebook(self, course, students, user):  # pylint: disable=unused-argument
+        """
+        Stands in for the platform grading of a page of students
+        """
+        return [
+            {
+                'course_id': unicode(course.id),
+                'email': student.email,
+                'full_name': student.username,
+                'grade_summary': None,
+                'progress_page_url': '',
+                'user_id': student.id,
+                'username': student.username,
+            }
+            for student in students
+        ]
+
+    def _get_page(self, **params):
+        """
+        Requests a page of the course gradebook
+        """
+        return self.client.get(self.uri, params)
+
+    def _get_usernames(self, response):
+        """
+        Returns the usernames of the students in a gradebook page
+        """
+        return [entry['username'] for entry in response.data['results']]
+
+    def test_first_page(self):
+        response = self._get_page(page_size=2)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._get_usernames(response), ['student0', 'student1'])
+        self.assertIn('page=2', response.data['next'])
+        self.assertIsNone(response.data['previous'])
+        self.assertNotIn('count', response.data)
+
+    def test_middle_page(self):
+        response = self._get_page(page_size=2, page=2)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._get_usernames(response), ['student2', 'student3'])
+        self.assertIn('page=3', response.data['next'])
+        # The previous link of the second page points to the first page without a page parameter
+        self.assertNotIn('page=', response.data['previous'])
+
+    def test_last_page(self):
+        response = self._get_page(page_size=2, page=3)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._get_usernames(response), ['student4'])
+        self.assertIsNone(response.data['next'])
+        self.assertIn('page=2', response.data['previous'])
+
+    def test_full_last_page(self):
+        # The extra student fetched past a page tells whether there is a next page
+        response = self._get_page(page_size=5)
+        self.assertEqual(len(response.data['results']), 5)
+        self.assertIsNone(response.data['next'])
+
+        response = self._get_page(page_size=4)
+        self.assertEqual(len(response.data['results']), 4)
+        self.assertIn('page=2', response.data['next'])
+
+    def test_invalid_pages(self):
+        for page in (0, -1, 'abc', 'last', 4):
+            response = self._get_page(page_size=2, page=page)
+            self.assertEqual(response.status_code, 404, 'page={}'.format(page))
+
+
+@override_settings(MODULESTORE=MODULESTORE_CONFIG)
+class CountQuerysetsTests(CourseGradingMixin, ModuleStoreTestCase):
+    """ Test suite for counting several querysets in a single query """
+
+    def setUp(self):
+        super(CountQuerysetsTests, self).setUp()
+        cache.clear()
+        self.course = self.setup_course_with_grading()
+        self.users = {}
+        for username, grade in (('alice', 0.9), ('bob', 0.6), ('carol', 0.3)):
+            user = UserFactory(username=username)
+            CourseEnrollmentFactory(user=user, course_id=self.course.id)
+            StudentGradebook.objects.create(
+                user=user,
+                course_id=self.course.id,
+                grade=grade,
+                proforma_grade=grade,
+                grade_summary='{}',
+                grading_policy='{}'
+            )
+            self.users[username] = user
+
+    def _assert_counts(self, *querysets):
+        """
+        Asserts the counts of the querysets are the ones they count on their own
+        """
+        self.assertEqual(count_querysets(*querysets), [queryset.count() for queryset in querysets])
+
+    def test_counts_match_querysets(self):
+        self._assert_counts(
+            User.objects.all(),
+            User.objects.filter(username__startswith='a'),
+            CourseEnrollment.objects.filter(course_id=self.course.id).values('user_id'),
+            StudentGradebook.objects.filter(grade__gt=0.5).order_by().values('user').distinct(),
+        )
+
+    def test_empty_querysets(self):
+        self.assertEqual(
+            count_querysets(
+                User.objects.none(),
+                User.objects.filter(username='alice'),
+                User.objects.filter(id__in=[]),
+                StudentGradebook.objects.filter(grade__gte=0.5),
+            ),
+            [0, 1, 0, 2]
+        )
+
+    def test_parameters_follow_their_subqueries(self):
+        # Each subquery takes parameters of its own, which would not match if they were shuffled
+        self._assert_counts(
+            User.objects.filter(username='alice'),
+            StudentGradebook.objects.filter(grade__gte=0.5, course_id=self.course.id),
+            User.objects.filter(username__in=['bob', 'carol']).exclude(id__in=[self.users['bob'].id]),
+            CourseEnrollment.objects.filter(course_id=self.course.id, user__username__in=['alice', 'carol']),
+        )
+
+    def test_time_series_metrics(self):
+        today = now().replace(hour=12, minute=0, second=0, microsecond=0)
+        # Alice and Bob enrolled before the series starts, Carol in the middle of it
+        CourseEnrollment.objects.filter(course_id=self.course.id, user__username__in=['alice', 'bob']).update(
+            created=today - timedelta(days=10)
+        )
+        CourseEnrollment.objects.filter(course_id=self.course.id, user=self.users['carol']).update(
+            created=today - timedelta(days=2)
+        )
+        uri = reverse('course-time-series-metrics', kwargs={'course_id': unicode(self.course.id)})
+        params = {
+            'start_date': (today - timedelta(days=5)).strftime('%Y-%m-%d'),
+            'end_date': (today + timedelta(days=1)).strftime('%Y-%m-%d'),
+            'interval': 'days',
+        }
+
+        response = self.client.get(uri, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([count for __, count in response.data['users_enrolled']], [0, 0, 0, 1, 0, 0])
+        self.assertEqual([count for __, count in response.data['users_not_started']], [2, 2, 2, 3, 3, 3])
+
+        # Group members are filtered with a subquery whose parameters come after the enrollment ones
+        group = Group.objects.create(name='time-series')
+        self.users['bob'].groups.add(group)
+        self.users['carol'].groups.add(group)
+        params['groups'] = group.id
+        response = self.client.get(uri, params)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([count for __, count in response.data['users_not_started']], [1, 1, 1, 2, 2, 2])
+
+
+@override_settings(MODULESTORE=MODULESTORE_CONFIG)
+class CoursesMetricsCacheTests(CourseGradingMixin, ModuleStoreTestCase):
+    """ Test suite for the caching of course metrics """
+
+    def setUp(self):
+        super(CoursesMetricsCacheTests, self).setUp()
+        cache.clear()
+        self.course = self.setup_course_with_grading()
+        self.uri = reverse('course-metrics', kwargs={'course_id': unicode(self.course.id)})
+        for username in ('alice', 'bob'):
+            self._enroll(username)
+
+    def _enroll(self, username):
+        """
+        Creates a user enrolled in the test course
+        """
+        user = UserFactory(username=username)
+        CourseEnrollmentFactory(user=user, course_id=self.course.id)
+        return user
+
+    def _get_users_enrolled(self, **params):
+        """
+        Returns the number of enrolled users reported by the course metrics
+        """
+        response = self.client.get(self.uri, params)
+        self.assertEqual(response.status_code, 200)
+        return response.data['users_enrolled']
+
+    def test_metrics_served_from_cache(self):
+        self.assertEqual(self._get_users_enrolled(), 2)
+        self._enroll('carol')
+        self.assertEqual(self._get_users_enrolled(), 2)
+
+        cache.clear()
+        self.assertEqual(self._get_users_enrolled(), 3)
+
+    def test_cache_key_varies_by_parameters(self):
+        self.assertEqual(self._get_users_enrolled(), 2)
+        carol = self._enroll('carol')
+        group = Group.objects.create(name='metrics')
+        carol.groups.add(group)
+
+        self.assertEqual(self._get_users_enrolled(groups=group.id), 1)
+        self.assertEqual(self._get_users_enrolled(metrics_required='users_started'), 3)
+        # Exclusions are not recomputed for a combination of parameters served from the cache
+        with patch('gradebook.utils.get_aggregate_exclusion_user_ids') as get_exclusion_user_ids:
+            self.assertEqual(self._get_users_enrolled(), 2)
+            self.assertEqual(self._get_users_enrolled(groups=group.id), 1)
+        self.assertFalse(get_exclusion_user_ids.called)
+
+
+Score = namedtuple('Score', ['earned', 'possible', 'graded', 'section', 'module_id'])
+
+
+class ModuleKey(object):
+    """
+    Module key counting how many times it is converted to a string
+    """
+    def __init__(self, value):
+        self.value = value
+        self.conversions = 0
+
+    def __str__(self):
+        self.conversions += 1
+        return self.value
+
+
+class StudentGradebookEntrySerializerTests(TestCase):
+    """ Test suite for the serialization of course gradebook entries """
+
+    def setUp(self):
+        super(StudentGradebookEntrySerializerTests, self).setUp()
+        self.module_id = u'block-v1:gradeX+GRAD1+2016+type@problem+block@homework'
+        score = Score(earned=1.0, possible=2.0, graded=True, section=u'Sequence 2', module_id=self.module_id)
+        self.entry = {
+            'course_id': u'course-v1:gradeX+GRAD1+2016',
+            'email': u'student@example.com',
+            'full_name': u'Test Student',
+            'progress_page_url': u'/courses/course-v1:gradeX+GRAD1+2016/progress/7',
+            'user_id': 7,
+            'username': u'student',
+            'grade_summary': {
+                'current_letter_grade': u'B',
+                'current_percent': 0.5,
+                'grade': u'B',
+                'grade_breakdown': [{'category': u'Homework', 'percent': 0.25}],
+                'manual_graded_per_policy': [],
+                'manual_graded_total_count': 0,
+                'percent': 0.5,
+                'raw_scores': [score],
+                'section_breakdown': [{
+                    'category': u'Homework',
+                    'detail': u'Homework 1 - Sequence 2 - 50% (1/2)',
+                    'displayed_value': u'0.50',
+                    'grade_description': u'(1.00/2.00)',
+                    'label': u'HW 01',
+                    'letter_grade': u'B',
+                    'percent': 0.5,
+                    'score_earned': 1.0,
+                    'score_possible': 2.0,
+                    'block_id': self.module_id,
+                }],
+                'total_letter_grade': u'B',
+                'totaled_scores': {u'Homework': [score]},
+            },
+        }
+        self.serialized_score = {
+            'auto_grade': None,
+            'earned': 1.0,
+            'graded': True,
+            'module_id': self.module_id,
+            'possible': 2.0,
+            'section': u'Sequence 2',
+        }
+
+    def test_serialize_entry(self):
+        data = StudentGradebookEntrySerializer(self.entry).data
+        self.assertEqual(data, {
+            'course_id': u'course-v1:gradeX+GRAD1+2016',
+            'email': u'student@example.com',
+            'full_name': u'Test Student',
+            'progress_page_url': u'/courses/course-v1:gradeX+GRAD1+2016/progress/7',
+            'user_id': 7,
+            'username': u'student',
+            'grade_summary': {
+                'current_letter_grade': u'B',
+                'current_percent': u'0.5',
+                'grade': u'B',
+                'grade_breakdown': [{'category': u'Homework', 'percent': 0.25}],
+                'manual_graded_per_policy': [],
+                'manual_graded_total_count': 0,
+                'percent': u'0.5',
+                'raw_scores': [self.serialized_score],
+                'section_breakdown': [{
+                    'are_grades_published': True,
+                    'auto_grade': None,
+                    'category': u'Homework',
+                    'chapter_name': '',
+                    'comment': '',
+                    'detail': u'Homework 1 - Sequence 2 - 50% (1/2)',
+                    'displayed_value': u'0.50',
+                    'grade_description': u'(1.00/2.00)',
+                    'is_ag': False,
+                    'is_average': False,
+                    'is_manually_graded': False,
+                    'label': u'HW 01',
+                    'letter_grade': u'B',
+                    'module_id': self.module_id,
+                    'percent': u'0.5',
+                    'score_earned': u'1.0',
+                    'score_possible': u'2.0',
+                    'section_block_id': '',
+                    'subsection_name': '',
+                }],
+                'total_letter_grade': u'B',
+                'totaled_scores': [{u'Homework': [self.serialized_score]}],
+            },
+        })
+
+    def test_serialize_unpublished_manual_grades(self):
+        section = self.entry['grade_summary']['section_breakdown'][0]
+        section.update({'is_manually_graded': True, 'are_grades_published': False, 'comment': u'Needs work'})
+        data = StudentGradebookEntrySerializer(self.entry).data['grade_summary']['section_breakdown'][0]
+        self.assertTrue(data['is_manually_graded'])
+        self.assertFalse(data['are_grades_published'])
+        self.assertEqual(data['comment'], u'Needs work')
+
+    def test_module_keys_stringified_once(self):
+        module_key = ModuleKey(self.module_id)
+        score = Score(earned=1.0, possible=2.0, graded=True, section=u'Sequence 2', module_id=module_key)
+        self.entry['grade_summary']['raw_scores'] = [score]
+        self.entry['grade_summary']['totaled_scores'] = {u'Homework': [score]}
+
+        data = StudentGradebookEntrySerializer(self.entry).data['grade_summary']
+        self.assertEqual(data['raw_scores'], [self.serialized_score])
+        self.assertEqual(data['totaled_scores'], [{u'Homework': [self.serialized_score]}])
+        self.assertEqual(module_key.conversions, 1)
+
+    @patch.dict(settings.FEATURES, {'GRADEBOOK_TOTALED_SCORES_AS_DICT': True})
+    def test_serialize_totaled_scores_as_dict(self):
+        data = StudentGradebookEntrySerializer(self.entry).data
+        self.assertEqual(data['grade_summary']['totaled_scores'], {u'Homework': [self.serialized_score]})
@@ -1,17 +1,28 @@
 """
 Utils methods for gradebook app
 """
+import hashlib
 import json
+import logging
 
+from django.conf import settings
+from django.core.cache import cache
 from django.db import transaction
+from django.db.models import Q
 from django.utils.decorators import method_decorator
 
 from course_blocks.api import get_course_blocks
 from courseware import grades
 from courseware.courses import get_course
 from gradebook.models import StudentGradebook
+from student.models import CourseAccessRole, CourseEnrollment
+from student.roles import CourseInstructorRole, CourseStaffRole, get_aggregate_exclusion_user_ids
 from xmodule.modulestore import EdxJSONEncoder
 from xmodule.modulestore.django import modulestore
+from xmodule_django.models import CourseKeyField
+
+
+log = logging.getLogger(__name__)
 
 
 @method_decorator(transaction.non_atomic_requests)
@@ -43,12 +54,19 @@ def generate_user_gradebook(course_key, user):
     )
 
     if gradebook_entry.grade != grade:
+        # Only write the columns whose value changed, sparing the large summaries when they did not
+        update_fields = ['grade', 'modified']
+        for field_name, value in (
+            ('proforma_grade', proforma_grade),
+            ('progress_summary', progress_summary),
+            ('grade_summary', grade_summary),
+            ('grading_policy', grading_policy),
+        ):
+            if getattr(gradebook_entry, field_name) != value:
+                setattr(gradebook_entry, field_name, value)
+                update_fields.append(field_name)
         gradebook_entry.grade = grade
-        gradebook_entry.proforma_grade = proforma_grade
-        gradebook_entry.progress_summary = progress_summary
-        gradebook_entry.grade_summary = grade_summary
-        gradebook_entry.grading_policy = grading_policy
-        gradebook_entry.save()
+        gradebook_entry.save(update_fields=update_fields)
 
     return gradebook_entry
 
@@ -56,6 +74,39 @@ def generate_user_gradebook(course_key, user):
 def get_json_data(obj):
     try:
         json_data = json.dumps(obj, cls=EdxJSONEncoder)
-    except:
+    except (TypeError, ValueError):
+        log.exception('Unable to encode %s data as JSON', type(obj).__name__)
         json_data = {}
     return json_data
+
+
+def get_enrolled_non_staff_students(course_key):
+    """
+    Returns the users enrolled in a course ordered by username, leaving out global staff as well
+    as the staff and instructors of the course or of its organization. The staff users are excluded
+    in the database rather than by checking the access of every enrolled user.
+    """
+    staff_user_ids = CourseAccessRole.objects.filter(
+        Q(course_id=course_key) | Q(course_id=CourseKeyField.Empty, org__iexact=course_key.org),
+        role__in=[CourseStaffRole.ROLE, CourseInstructorRole.ROLE]
+    ).values('user_id')
+    return CourseEnrollment.objects.users_enrolled_in(course_key).filter(
+        is_staff=False
+    ).exclude(
+        id__in=staff_user_ids
+    ).select_related('profile').order_by('username')
+
+
+def get_cached_aggregate_exclusion_user_ids(course_key, roles=None):
+    """
+    Returns the ids of the users to leave out of the aggregations of a course, as returned by
+    get_aggregate_exclusion_user_ids, caching them for GRADEBOOK_EXCLUSION_CACHE_TIMEOUT seconds
+    """
+    cache_key = u'gradebook.exclusion_user_ids.{}'.format(hashlib.md5(repr((
+        unicode(course_key), None if roles is None else sorted(roles)
+    ))).hexdigest())
+    exclude_users = cache.get(cache_key)
+    if exclude_users is None:
+        exclude_users = frozenset(get_aggregate_exclusion_user_ids(course_key, roles=roles))
+        cache.set(cache_key, exclude_users, getattr(settings, 'GRADEBOOK_EXCLUSION_CACHE_TIMEOUT', 60))
+    return exclude_users
@@ -1,21 +1,23 @@
 """ API implementation for course-oriented interactions. """
 
+import hashlib
 import logging
 from datetime import timedelta
 
 from django.conf import settings
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.db import transaction
-from django.db.models import Count, F, Max, Min
+from django.db.models import Avg, Count, F, Max, Min
 from django.utils.translation import ugettext_lazy as _
 from opaque_keys.edx.keys import CourseKey
 from rest_framework import generics, status
 from rest_framework.response import Response
 
-from courseware.access import get_enrolled_non_staff_students
 from courseware.courses import get_course_with_access
 from courseware.models import StudentModule
 from gradebook.api_utils import (
+    count_querysets,
     css_param_to_list,
     generate_base_uri,
     get_ids_from_list_param,
@@ -23,14 +25,14 @@ from gradebook.api_utils import (
     parse_datetime
 )
 from gradebook.courseware_access import course_exists, get_course, get_course_key
-from gradebook.models import StudentGradebook
+from gradebook.models import StudentGradebook, get_group_members
 from gradebook.pagination import GradebookPagination
 from gradebook.permissions import SecureAPIView, SecureListAPIView
-from gradebook.serializers import CourseLeadersSerializer, GradeSerializer, StudentGradebookEntrySerializer
+from gradebook.serializers import StudentGradebookEntrySerializer, serialize_course_leaders
+from gradebook.utils import get_cached_aggregate_exclusion_user_ids, get_enrolled_non_staff_students
 from instructor.offline_gradecalc import prepare_gradebook
 from progress.models import CourseModuleCompletion, StudentProgress
 from student.models import CourseEnrollment
-from student.roles import get_aggregate_exclusion_user_ids
 from xmodule.modulestore.django import modulestore
 
 log = logging.getLogger(__name__)
@@ -55,23 +57,39 @@ class CoursesMetrics(SecureAPIView):
         """
         if not course_exists(request, request.user, course_id):
             return Response({}, status=status.HTTP_404_NOT_FOUND)
-        course_descriptor, course_key, course_content = get_course(request, request.user, course_id)  # pylint: disable=W0612
-        exclude_users = get_aggregate_exclusion_user_ids(course_key)
-        users_enrolled_qs = CourseEnrollment.objects.users_enrolled_in(course_key).exclude(id__in=exclude_users)
         organization = request.query_params.get('organization', None)
         metrics_required = css_param_to_list(request, 'metrics_required')
+        group_ids = get_ids_from_list_param(self.request, 'groups')
+
+        # Metrics change slowly compared to how often dashboards poll them, so they are cached for a short while
+        cache_key = u'gradebook.course_metrics.{}'.format(hashlib.md5(repr((
+            unicode(course_id), unicode(organization), sorted(group_ids or []), sorted(metrics_required)
+        ))).hexdigest())
+        data = cache.get(cache_key)
+        if data is None:
+            data = self._get_metrics(request, course_id, organization, group_ids, metrics_required)
+            cache.set(cache_key, data, getattr(settings, 'GRADEBOOK_METRICS_CACHE_TIMEOUT', 60))
+
+        return Response(data, status=status.HTTP_200_OK)
+
+    def _get_metrics(self, request, course_id, organization, group_ids, metrics_required):
+        """
+        Computes the requested metrics of the course
+        """
+        course_descriptor, course_key, course_content = get_course(request, request.user, course_id)  # pylint: disable=W0612
+        exclude_users = get_cached_aggregate_exclusion_user_ids(course_key)
+        users_enrolled_qs = CourseEnrollment.objects.users_enrolled_in(course_key).exclude(id__in=exclude_users)
         org_ids = None
         if organization:
             users_enrolled_qs = users_enrolled_qs.filter(organizations=organization)
             org_ids = [organization]
 
-        group_ids = get_ids_from_list_param(self.request, 'groups')
         if group_ids:
-            users_enrolled_qs = users_enrolled_qs.filter(groups__in=group_ids)
+            users_enrolled_qs = users_enrolled_qs.filter(id__in=get_group_members(group_ids))
 
         data = {
             'grade_cutoffs': course_descriptor.grading_policy['GRADE_CUTOFFS'],
-            'users_enrolled': users_enrolled_qs.distinct().count()
+            'users_enrolled': users_enrolled_qs.count()
         }
 
         if 'users_started' in metrics_required:
@@ -96,7 +114,7 @@ class CoursesMetrics(SecureAPIView):
             )
             data['users_completed'] = users_completed
 
-        return Response(data, status=status.HTTP_200_OK)
+        return data
 
 
 class CoursesUserMetrics(SecureAPIView):
@@ -168,30 +186,28 @@ class CoursesTimeSeriesMetrics(SecureAPIView):
         start_dt = parse_datetime(start)
         end_dt = parse_datetime(end)
         course_key = get_course_key(course_id)
-        exclude_users = get_aggregate_exclusion_user_ids(course_key)
+        exclude_users = get_cached_aggregate_exclusion_user_ids(course_key)
         grade_complete_match_range = getattr(settings, 'GRADEBOOK_GRADE_COMPLETE_PROFORMA_MATCH_RANGE', 0.01)
+        # Restrict to enrolled users with one subquery rather than joining the enrollments in every queryset
+        enrolled_users = CourseEnrollment.objects.filter(course_id__exact=course_key, is_active=True).values('user_id')
         grades_qs = StudentGradebook.objects.filter(course_id__exact=course_key, user__is_active=True,
-                                                    user__courseenrollment__is_active=True,
-                                                    user__courseenrollment__course_id__exact=course_key).\
+                                                    user__in=enrolled_users).\
             exclude(user_id__in=exclude_users)
         grades_complete_qs = grades_qs.filter(proforma_grade__lte=F('grade') + grade_complete_match_range,
                                               proforma_grade__gt=0)
         enrolled_qs = CourseEnrollment.objects.filter(course_id__exact=course_key, user__is_active=True,
                                                       is_active=True).exclude(user_id__in=exclude_users)
         users_started_qs = StudentProgress.objects.filter(course_id__exact=course_key, user__is_active=True,
-                                                          user__courseenrollment__is_active=True,
-                                                          user__courseenrollment__course_id__exact=course_key)\
+                                                          user__in=enrolled_users)\
             .exclude(user_id__in=exclude_users)
         modules_completed_qs = CourseModuleCompletion.get_actual_completions()\
             .filter(course_id__exact=course_key,
-                    user__courseenrollment__is_active=True,
-                    user__courseenrollment__course_id__exact=course_key,
+                    user__in=enrolled_users,
                     user__is_active=True)\
             .exclude(user_id__in=exclude_users)
         active_users_qs = StudentModule.objects\
             .filter(course_id__exact=course_key, student__is_active=True,
-                    student__courseenrollment__is_active=True,
-                    student__courseenrollment__course_id__exact=course_key)\
+                    student__in=enrolled_users)\
             .exclude(student_id__in=exclude_users)
 
         organization = request.query_params.get('organization', None)
@@ -204,15 +220,17 @@ class CoursesTimeSeriesMetrics(SecureAPIView):
 
         group_ids = get_ids_from_list_param(self.request, 'groups')
         if group_ids:
-            enrolled_qs = enrolled_qs.filter(user__groups__in=group_ids).distinct()
-            grades_complete_qs = grades_complete_qs.filter(user__groups__in=group_ids).distinct()
-            users_started_qs = users_started_qs.filter(user__groups__in=group_ids).distinct()
-            modules_completed_qs = modules_completed_qs.filter(user__groups__in=group_ids).distinct()
-            active_users_qs = active_users_qs.filter(student__groups__in=group_ids).distinct()
-
-        total_enrolled = enrolled_qs.filter(created__lt=start_dt).count()
-        total_started_count = users_started_qs.filter(created__lt=start_dt).aggregate(Count('user', distinct=True))
-        total_started = total_started_count['user__count'] or 0
+            group_members = get_group_members(group_ids)
+            enrolled_qs = enrolled_qs.filter(user__in=group_members)
+            grades_complete_qs = grades_complete_qs.filter(user__in=group_members)
+            users_started_qs = users_started_qs.filter(user__in=group_members)
+            modules_completed_qs = modules_completed_qs.filter(user__in=group_members)
+            active_users_qs = active_users_qs.filter(student__in=group_members)
+
+        total_enrolled, total_started = count_querysets(
+            enrolled_qs.filter(created__lt=start_dt).order_by().values('id'),
+            users_started_qs.filter(created__lt=start_dt).order_by().values('user').distinct()
+        )
         enrolled_series = get_time_series_data(
             enrolled_qs, start_dt, end_dt, interval=interval,
             date_field='created', date_field_model=CourseEnrollment,
@@ -277,11 +295,11 @@ class CoursesMetricsGradesList(SecureListAPIView):
         if not course_exists(request, request.user, course_id):
             return Response({}, status=status.HTTP_404_NOT_FOUND)
         course_key = get_course_key(course_id)
-        exclude_users = get_aggregate_exclusion_user_ids(course_key)
+        exclude_users = get_cached_aggregate_exclusion_user_ids(course_key)
+        enrolled_users = CourseEnrollment.objects.filter(course_id__exact=course_key, is_active=True).values('user_id')
         queryset = StudentGradebook.objects.filter(course_id__exact=course_key,
                                                    user__is_active=True,
-                                                   user__courseenrollment__is_active=True,
-                                                   user__courseenrollment__course_id__exact=course_key)\
+                                                   user__in=enrolled_users)\
             .exclude(user__in=exclude_users)
         user_ids = get_ids_from_list_param(self.request, 'user_id')
         if user_ids:
@@ -289,13 +307,9 @@ class CoursesMetricsGradesList(SecureListAPIView):
 
         group_ids = get_ids_from_list_param(self.request, 'groups')
         if group_ids:
-            queryset = queryset.filter(user__groups__in=group_ids).distinct()
+            queryset = queryset.filter(user__in=get_group_members(group_ids))
 
-        sum_of_grades = sum([gradebook.grade for gradebook in queryset])
-        queryset_grade_avg = sum_of_grades / len(queryset) if len(queryset) > 0 else 0
-        queryset_grade_count = len(queryset)
-        queryset_grade_max = queryset.aggregate(Max('grade'))
-        queryset_grade_min = queryset.aggregate(Min('grade'))
+        queryset_grade_stats = queryset.aggregate(Avg('grade'), Count('id'), Max('grade'), Min('grade'))
 
         course_metrics = StudentGradebook.generate_leaderboard(course_key,
                                                                group_ids=group_ids,
@@ -305,20 +319,18 @@ class CoursesMetricsGradesList(SecureListAPIView):
         base_uri = generate_base_uri(request)
         response_data['uri'] = base_uri
 
-        response_data['grade_average'] = queryset_grade_avg
-        response_data['grade_count'] = queryset_grade_count
-        response_data['grade_maximum'] = queryset_grade_max['grade__max']
-        response_data['grade_minimum'] = queryset_grade_min['grade__min']
+        response_data['grade_average'] = queryset_grade_stats['grade__avg'] or 0
+        response_data['grade_count'] = queryset_grade_stats['id__count']
+        response_data['grade_maximum'] = queryset_grade_stats['grade__max']
+        response_data['grade_minimum'] = queryset_grade_stats['grade__min']
 
         response_data['course_grade_average'] = course_metrics['course_avg']
         response_data['course_grade_maximum'] = course_metrics['course_max']
         response_data['course_grade_minimum'] = course_metrics['course_min']
         response_data['course_grade_count'] = course_metrics['course_count']
 
-        response_data['grades'] = []
-        for row in queryset:
-            serializer = GradeSerializer(row)
-            response_data['grades'].append(serializer.data)  # pylint: disable=E1101
+        # Grades are plain floats, so the rows are built directly rather than through GradeSerializer
+        response_data['grades'] = [{'grade': grade} for grade in queryset.values_list('grade', flat=True).iterator()]
         return Response(response_data, status=status.HTTP_200_OK)
 
 
@@ -353,15 +365,14 @@ class CoursesMetricsGradesLeadersList(SecureListAPIView):
             return Response({}, status=status.HTTP_404_NOT_FOUND)
         course_key = get_course_key(course_id)
         # Users having certain roles (such as an Observer) are excluded from aggregations
-        exclude_users = get_aggregate_exclusion_user_ids(course_key, roles=exclude_roles)
+        exclude_users = get_cached_aggregate_exclusion_user_ids(course_key, roles=exclude_roles)
         leaderboard_data = StudentGradebook.generate_leaderboard(course_key,
                                                                  user_id=user_id,
                                                                  group_ids=group_ids,
                                                                  count=count,
                                                                  exclude_users=exclude_users)
 
-        serializer = CourseLeadersSerializer(leaderboard_data['queryset'], many=True)
-        data['leaders'] = serializer.data  # pylint: disable=E1101
+        data['leaders'] = serialize_course_leaders(leaderboard_data['queryset'])
         data['course_avg'] = leaderboard_data['course_avg']
         if 'user_position' in leaderboard_data:
             data['user_position'] = leaderboard_data['user_position']
@@ -384,13 +395,15 @@ class CourseGradeBook(generics.ListAPIView):
 
     def list(self, request, course_id):
         course_key = CourseKey.from_string(course_id)
-        course = get_course_with_access(request.user, 'staff', course_key, depth=None)
-        non_staff_students = get_enrolled_non_staff_students(course, course_key)
+        # A single bulk operation lets the modulestore reads of every student on the page share its caches
+        with modulestore().bulk_operations(course_key):
+            course = get_course_with_access(request.user, 'staff', course_key, depth=None)
+            non_staff_students = get_enrolled_non_staff_students(course_key)
 
-        paginator = self.pagination_class()
-        page = paginator.paginate_queryset(non_staff_students, request)
+            paginator = self.pagination_class()
+            page = paginator.paginate_queryset(non_staff_students, request)
 
-        grade_summaries = prepare_gradebook(course, page, request.user)
+            grade_summaries = prepare_gradebook(course, page, request.user)
 
         serializer = StudentGradebookEntrySerializer(grade_summaries, many=True)
 